@@ -4,14 +4,140 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.layers import Layer
 
+# Size in bytes of the slice of filters used by each convolution, so that the
+# working set of a convolution fits in on-chip memory
+FILTER_TILE_BYTES = 256 * 1024
+
+
+def _morlet_kernels(t_array, scales, beta, fs):
+    """Real and imaginary parts of the Morlet wavelet bank, each of shape
+    [kernel_size, n_scales], computed with NumPy broadcasting."""
+    scaled_t = t_array[:, None] / scales[None, :]
+    norm_constant = np.sqrt(np.pi * beta) * scales * fs / 2.0
+    kernel_base = np.exp(-(scaled_t ** 2) / beta) / norm_constant
+    # Share the phase between cos and sin, working in place
+    phase = 2 * np.pi * scaled_t
+    kernel_real = np.cos(phase)
+    kernel_imag = np.sin(phase, out=phase)
+    kernel_real *= kernel_base
+    kernel_imag *= kernel_base
+    return kernel_real, kernel_imag
+
+
+def _morlet_scales(lower_freq, upper_freq, n_scales):
+    """Scales of the Morlet wavelet bank, increasing exponentially."""
+    # From the initial scale 1 / upper_freq to the last 1 / lower_freq
+    return np.geomspace(1 / upper_freq, 1 / lower_freq, n_scales, dtype=np.float64)
+
+
+def _morlet_time(scales, wavelet_width, size_factor, fs):
+    """Time axis of the kernels of the Morlet wavelet bank."""
+    # We will make a bigger wavelet in case the width grows
+    # For the size of the wavelet we use the initial width value.
+    # |t| < truncation_size => |k| < truncation_size * fs
+    truncation_size = scales.max() * np.sqrt(4.5 * wavelet_width) * fs
+    one_side = int(size_factor * truncation_size)
+    kernel_size = 2 * one_side + 1
+    k_array = np.arange(kernel_size, dtype=np.float32) - one_side
+    return k_array / fs  # Time units
+
+
+def _morlet_support(scales, wavelet_width, size_factor, fs, fft_epsilon, fft_length):
+    """Signed bins [first_bin, last_bin) of a length fft_length DFT where the
+    spectrum of each scaled Morlet wavelet is above fft_epsilon. Bins are
+    taken modulo fft_length, so negative bins are negative frequencies and
+    a support longer than fft_length wraps around (see _fold_spectrum)."""
+    # The Fourier transform of the scaled wavelet with the normalization
+    # constant Z is a gaussian centered at 2 * pi / scale:
+    # PSI_s(w) = 2 * exp(-beta * (w * scale - 2 * pi)^2 / 4)
+    # It is above fft_epsilon only for |w * scale - 2 * pi| < half_band.
+    # For small widths this band crosses zero and the Nyquist frequency, so
+    # the support is not restricted to the positive bins.
+    # As with the kernel size, the support is computed from the initial
+    # width value, relaxed by size_factor in case the width shrinks.
+    support_width = wavelet_width / size_factor ** 2
+    half_band = 2 * np.sqrt(np.log(2 / fft_epsilon) / support_width)
+    # Angular frequency (rad/s) to DFT bin
+    bin_per_omega = fft_length / (2 * np.pi * fs)
+    support = []
+    for scale in scales:
+        first_bin = int(np.ceil((2 * np.pi - half_band) / scale * bin_per_omega))
+        last_bin = int(np.floor((2 * np.pi + half_band) / scale * bin_per_omega)) + 1
+        last_bin = max(last_bin, first_bin + 1)
+        support.append((first_bin, last_bin))
+    return support
+
+
+def _fold_spectrum(values, fft_length):
+    """Sums the values of a spectrum on bins [first_bin, first_bin + len(values))
+    that fall on the same bin modulo fft_length, so that at most fft_length
+    values are returned, still starting at first_bin. The spectrum of the
+    sampled wavelet is the sum of these aliases."""
+    n_values = values.shape[0]
+    if n_values <= fft_length:
+        return values
+    values = tf.pad(values, [[0, -n_values % fft_length]])
+    return tf.reduce_sum(tf.reshape(values, [-1, fft_length]), axis=0)
+
+
+def _stack_filters(real_part, imaginary_part):
+    """Filters of the convolution: real and imaginary parts of shape
+    [1, kernel_size, 1, n_scales] stacked along the output channels so the
+    input is read once, zero padded to a multiple of 8 so that cuDNN can
+    use tensor cores."""
+    filters = tf.concat([real_part, -imaginary_part], axis=-1)
+    n_pad = -filters.shape[-1] % 8
+    return tf.pad(filters, [[0, 0], [0, 0], [0, 0], [0, n_pad]])
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_bank(fs, lower_freq, upper_freq, n_scales, wavelet_width, size_factor):
+    """Real and imaginary parts of a fixed Morlet wavelet bank, each of
+    shape [1, kernel_size, 1, n_scales], and the filters stacked from them,
+    as float32 constants. Cached, so layers with the same hyperparameters
+    share the same tensors."""
+    scales = _morlet_scales(lower_freq, upper_freq, n_scales)
+    t_array = _morlet_time(scales, wavelet_width, size_factor, fs)
+    kernel_real, kernel_imag = _morlet_kernels(
+        t_array.astype(np.float64), scales, wavelet_width, fs)
+    # Eager tensors, even if the layer is built inside a graph
+    with tf.init_scope():
+        real_part = tf.constant(kernel_real.reshape(1, -1, 1, n_scales), dtype=tf.float32)
+        imaginary_part = tf.constant(kernel_imag.reshape(1, -1, 1, n_scales), dtype=tf.float32)
+        filters = _stack_filters(real_part, imaginary_part)
+    return real_part, imaginary_part, filters
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_spectra(fs, lower_freq, upper_freq, n_scales, wavelet_width, size_factor,
+                    fft_epsilon, fft_length):
+    """Spectra of a fixed Morlet wavelet bank on their support, as a tuple
+    with a (first_bin, values) pair per scale, where values is a complex64
+    constant. Cached like _cached_bank."""
+    scales = _morlet_scales(lower_freq, upper_freq, n_scales)
+    support = _morlet_support(scales, wavelet_width, size_factor, fs, fft_epsilon, fft_length)
+    bin_per_omega = fft_length / (2 * np.pi * fs)
+    spectra = []
+    for scale, (first_bin, last_bin) in zip(scales, support):
+        scaled_omega = np.arange(first_bin, last_bin) / bin_per_omega * scale
+        values = 2.0 * np.exp(-wavelet_width * (scaled_omega - 2 * np.pi) ** 2 / 4.0)
+        with tf.init_scope():
+            values = _fold_spectrum(tf.constant(values, dtype=tf.float32), fft_length)
+            spectra.append((first_bin, tf.cast(values, tf.complex64)))
+    return tuple(spectra)
+
+
 class ContinuousWaveletTransform(Layer):
     """CWT layer implementation in Tensorflow for GPU acceleration."""
     def __init__(self, n_scales, border_crop=0, stride=1, name='CWT',
-                 outputformat='Complex',  data_format='channels_last' ):
+                 outputformat='Complex',  data_format='channels_last',
+                 fft_mode=False, jit_compile=False):
         """
         Args:
             n_scales: (int) Number of scales for the scalogram.
@@ -21,14 +147,33 @@ class ContinuousWaveletTransform(Layer):
                 desired size to remove border effects of the CWT. Default 0.
             stride: (int) The stride of the sliding window across the input.
                 Default is 1.
+            fft_mode: (boolean) If True, the CWT is computed by multiplying
+                the signal spectrum with the spectra of the wavelet bank
+                instead of convolving in the time domain. This is faster for
+                long kernels but requires a static time_len. The result
+                matches the convolution only as far as the spectra match
+                the Fourier transform of the truncated kernels. Default False.
+            jit_compile: (boolean) If True, the CWT is compiled with XLA, so
+                the convolution outputs are fused with the magnitude or phase
+                computation. XLA compiles again for every new input shape,
+                including the batch size. Default False.
         """
         super(ContinuousWaveletTransform, self).__init__(name=name)
         self.n_scales = n_scales
         self.border_crop = border_crop
         self.stride = stride
+        # Output samples cropped at each border
+        self._start = border_crop // stride
         self.outputformat = outputformat
         self.data_format = data_format
+        self.fft_mode = fft_mode
         self.real_part, self.imaginary_part = self._build_wavelet_bank()
+        self.filters = self._build_filters()
+        # Number of filters per convolution, a multiple of 8 between 8 and 64
+        filter_bytes = self.filters.shape[1] * self.filters.dtype.size
+        self._filter_tile = min(max(FILTER_TILE_BYTES // filter_bytes // 8 * 8, 8), 64)
+        self.jit_compile = jit_compile
+        self._compute = tf.function(self._compute_scalograms, jit_compile=jit_compile)
 
     def _build_wavelet_bank(self):
         """Needs implementation to compute the real and imaginary parts
@@ -38,7 +183,179 @@ class ContinuousWaveletTransform(Layer):
         imaginary_part = None
         return real_part, imaginary_part
 
-    @tf.function
+    def _build_filters(self):
+        """Filters of the convolution, of shape [1, kernel_size, 1, n_filters],
+        built from the wavelet bank with _stack_filters. Called again when
+        the computation is traced, so that filters built from trainable
+        variables receive gradients."""
+        return _stack_filters(self.real_part, self.imaginary_part)
+
+    def _build_wavelet_spectra(self, fft_length):
+        """Needs implementation to compute the Fourier transform of the
+        wavelet bank, evaluated at the frequencies of a length fft_length
+        DFT. Only the support of each spectrum is kept, so it is expected to
+        be a list with a (first_bin, values) tuple per scale, where values
+        is a complex tensor holding the spectrum of that scale on the bins
+        [first_bin, first_bin + len(values)) and the spectrum is assumed to
+        be zero elsewhere. Bins are taken modulo fft_length, so first_bin
+        may be negative to include negative frequencies, and at most
+        fft_length values are expected."""
+        spectra = None
+        return spectra
+
+    def _fft_convolve(self, inputs):
+        """
+        Convolves the inputs with the wavelet bank in the Fourier domain.
+
+        Args:
+            inputs: (tensor) A batch of 1D tensors of shape
+                [batch_size, n_channels, time_len].
+        Returns:
+            Complex64 tensor with the convolution, of shape
+            [batch_size, n_channels, n_out, n_scales], where
+            n_out = max(ceil(time_len / stride) - 2 * (border_crop // stride), 0),
+            sampled at the same positions as the "SAME" padded convolution
+            after cropping the borders.
+        """
+        time_len = inputs.shape[-1]
+        if time_len is None:
+            raise ValueError("fft_mode requires a static time_len.")
+        kernel_size = self.real_part.shape[1]
+        one_side = kernel_size // 2
+        # Zero padding by at least one_side samples avoids circular wrap-around
+        fft_length = int(2 ** np.ceil(np.log2(time_len + one_side)))
+        # Sample at the kernel centers used by the "SAME" padded convolution,
+        # skipping the cropped borders
+        n_same = -(-time_len // self.stride)
+        pad_total = max((n_same - 1) * self.stride + kernel_size - time_len, 0)
+        first = one_side - pad_total // 2 + self._start * self.stride
+        last = one_side - pad_total // 2 + (n_same - self._start) * self.stride
+
+        # [batch, n_channels, time_len] -> [batch, n_channels, fft_length // 2 + 1]
+        signal_fft = tf.signal.rfft(tf.cast(inputs, tf.float32), fft_length=[fft_length])
+        out = []
+        for first_bin, values in self._build_wavelet_spectra(fft_length):
+            # Multiply only within the support of the spectrum, which may
+            # include negative frequencies. These are read from the rfft
+            # through the conjugate symmetry of the real signal.
+            n_values = values.shape[0]
+            bins = np.arange(first_bin, first_bin + n_values) % fft_length
+            mirrored = bins > fft_length // 2
+            window = tf.gather(
+                signal_fft, np.where(mirrored, fft_length - bins, bins), axis=-1)
+            window = tf.where(mirrored, tf.math.conj(window), window)
+            product = window * values
+            # Move the support back to its bins of the full DFT
+            product = tf.pad(product, [[0, 0], [0, 0], [0, fft_length - n_values]])
+            product = tf.roll(product, shift=first_bin % fft_length, axis=-1)
+            out_scale = tf.signal.ifft(product)
+            out.append(out_scale[..., first:last:self.stride])
+
+        # -> [batch, n_channels, time, n_scales]
+        out = tf.stack(out, axis=-1)
+        return out
+
+    def _to_complex(self, out):
+        """Combines the outputs of the stacked real and imaginary filters,
+        given along the last axis, into a complex64 tensor with n_scales in
+        its last axis. Padded filters are dropped."""
+        out = tf.cast(out, tf.float32)
+        return tf.complex(out[..., :self.n_scales], out[..., self.n_scales:2 * self.n_scales])
+
+    def _pad_for_valid(self, inputs):
+        """
+        Pads the time axis of inputs of shape [batch, time_len, depth] so that
+        a "VALID" convolution directly yields the samples of a "SAME"
+        convolution after cropping border_crop // stride samples at each
+        border. Negative paddings crop the inputs instead. Returns the padded
+        inputs and the number of output samples n_out. If the crop removes
+        every sample, n_out is 0 but the inputs are still padded to
+        kernel_size, since "VALID" needs at least one output, so the output
+        must be sliced to [:, :n_out].
+        """
+        kernel_size = self.filters.shape[1]
+        time_len = tf.shape(inputs)[1]
+        n_same = -(-time_len // self.stride)
+        pad_total = tf.maximum((n_same - 1) * self.stride + kernel_size - time_len, 0)
+        pad_left = tf.maximum(pad_total // 2 - self._start * self.stride, -time_len)
+        n_out = tf.maximum(n_same - 2 * self._start, 0)
+        padded_len = tf.maximum(n_out - 1, 0) * self.stride + kernel_size
+        pad_right = padded_len - time_len - pad_left
+        inputs = inputs[:, tf.maximum(-pad_left, 0):time_len + tf.minimum(pad_right, 0)]
+        paddings = [[0, 0], [tf.maximum(pad_left, 0), tf.maximum(pad_right, 0)], [0, 0]]
+        return tf.pad(inputs, paddings), n_out
+
+    def _conv_convolve(self, inputs):
+        """
+        Convolves each channel of the inputs with the wavelet bank using conv1d.
+
+        Args:
+            inputs: (tensor) A batch of 1D tensors of shape
+                [batch_size, n_channels, time_len].
+        Returns:
+            Complex64 tensor with the cropped convolution, of shape
+            [batch_size, n_channels, n_out, n_scales], where
+            n_out = max(ceil(time_len / stride) - 2 * (border_crop // stride), 0).
+        """
+        # [batch, n_channels,  time_len] -> [batch * n_channels, time_len, 1]
+        input_shape = tf.shape(inputs)
+        inputs_flat = tf.reshape(inputs, [-1, input_shape[2], 1])
+        inputs_flat, n_out = self._pad_for_valid(inputs_flat)
+
+        # Run in the compute dtype of the layer (float16 under a mixed
+        # precision policy)
+        inputs_flat = tf.cast(inputs_flat, self.compute_dtype)
+        # [1, kernel_size, 1, n_filters] -> [kernel_size, 1, n_filters]
+        filters = tf.cast(self._build_filters()[0], self.compute_dtype)
+        # Convolve with tiles of the filter bank, so that large banks
+        # do not exceed on-chip memory
+        out = []
+        for first in range(0, filters.shape[-1], self._filter_tile):
+            out.append(tf.nn.conv1d(
+                input=inputs_flat, filters=filters[..., first:first + self._filter_tile],
+                stride=self.stride, padding="VALID"))
+        out = tf.concat(out, axis=-1)[:, :n_out]
+
+        # -> [batch, n_channels, time, n_filters)]
+        out = tf.reshape(out, [input_shape[0], input_shape[1], tf.shape(out)[1], out.shape[-1]])
+        return self._to_complex(out)
+
+    def _depthwise_convolve(self, inputs):
+        """
+        Convolves each channel of the inputs with the wavelet bank using a
+        depthwise conv2d, which keeps the channels in the last axis.
+
+        Args:
+            inputs: (tensor) A batch of 1D tensors of shape
+                [batch_size, time_len, n_channels], with static n_channels.
+        Returns:
+            Complex64 tensor with the cropped convolution, of shape
+            [batch_size, n_out, n_channels, n_scales], where
+            n_out = max(ceil(time_len / stride) - 2 * (border_crop // stride), 0).
+        """
+        n_channels = inputs.shape[-1]
+        inputs, n_out = self._pad_for_valid(inputs)
+        # [batch, time_len, n_channels] -> [batch, 1, time_len, n_channels]
+        inputs_expand = tf.expand_dims(tf.cast(inputs, self.compute_dtype), axis=1)
+        filters = tf.cast(self._build_filters(), self.compute_dtype)
+        out = []
+        for first in range(0, filters.shape[-1], self._filter_tile):
+            # Same filters for every channel -> [1, kernel_size, n_channels, tile]
+            tile_filters = filters[..., first:first + self._filter_tile]
+            tile_size = tile_filters.shape[-1]
+            tile_filters = tf.tile(tile_filters, [1, 1, n_channels, 1])
+            # Depthwise kernels require equal strides in both spatial axes,
+            # which is harmless for the unit height.
+            out_tile = tf.nn.depthwise_conv2d(
+                inputs_expand, tile_filters,
+                strides=[1, self.stride, self.stride, 1], padding="VALID")
+            # [batch, 1, time, n_channels * tile] -> [batch, time, n_channels, tile]
+            out_tile = tf.reshape(
+                out_tile, [-1, tf.shape(out_tile)[2], n_channels, tile_size])
+            out.append(out_tile)
+        out = tf.concat(out, axis=-1)[:, :n_out]
+        return self._to_complex(out)
+
     def call(self, inputs):
         """
         Computes the CWT with the specified wavelet bank.
@@ -54,42 +371,78 @@ class ContinuousWaveletTransform(Layer):
             channels. The shape of this tensor is
             [batch_size, time_len, n_scales, 2 * n_channels]
         """
+        return self._compute(inputs)
 
-        # Generate the scalogram
-        border_crop = self.border_crop // self.stride #int(self.border_crop / self.stride)
-        start = border_crop
-        end = (-border_crop) if (border_crop > 0) else None
+    def _compute_scalograms(self, inputs):
+        """Computes the CWT as described in call. It is wrapped by
+        tf.function in __init__, with XLA compilation if jit_compile."""
 
-        if self.data_format == 'channels_last' :
-            inputs = tf.transpose(a=inputs, perm=[0, 2, 1]) # [batch, time_len, n_channels] -> [batch, n_channels,  time_len]
+        # channels_first is the native layout of the computation. For a
+        # single channel in channels_last, the transposes only move a unit
+        # axis, so they are replaced by reshapes that do not copy data.
+        # Several channels in channels_last are convolved depthwise, keeping
+        # the [batch, time, n_channels, n_scales] layout.
+        single_channel = self.data_format == 'channels_last' and inputs.shape[-1] == 1
+        depthwise = (self.data_format == 'channels_last' and not self.fft_mode
+                     and inputs.shape[-1] not in [1, None])
+        channel_axis = 2 if depthwise else 1
 
-        # [batch, n_channels,  time_len] -> [batch, n_channel, 1, time_len, 1]
-        inputs_expand = tf.expand_dims(inputs, axis=2)
-        inputs_expand = tf.expand_dims(inputs_expand, axis=4)
-
-        out_real = tf.nn.conv2d(
-            input=inputs_expand, filters=self.real_part,
-            strides=[1, 1, self.stride, 1], padding="SAME")
-        out_imag = tf.nn.conv2d(
-            input=inputs_expand, filters=-self.imaginary_part,
-            strides=[1, 1, self.stride, 1], padding="SAME")
+        if depthwise:
+            out = self._depthwise_convolve(inputs)
+        else:
+            if single_channel:
+                inputs = tf.reshape(inputs, [-1, 1, tf.shape(inputs)[1]]) # [batch, time_len, 1] -> [batch, 1,  time_len]
+            elif self.data_format == 'channels_last' :
+                inputs = tf.transpose(a=inputs, perm=[0, 2, 1]) # [batch, time_len, n_channels] -> [batch, n_channels,  time_len]
 
-        #Crop and drop redundant axis to create [batch, n_channels, time, n_scales)]
-        out_real = out_real[:, :, 0, start:end, :]
-        out_imag = out_imag[:, :, 0, start:end, :]
+            if self.fft_mode:
+                out = self._fft_convolve(inputs)
+            else:
+                out = self._conv_convolve(inputs)
 
+        # Layout of out is [batch, n_channels, time, n_scales)], or
+        # [batch, time, n_channels, n_scales)] when depthwise
         if self.outputformat == 'magnitude':
-            scalograms = tf.sqrt(out_real**2 + out_imag**2)  # magnitude [batch, n_channels, time, n_scales)]
+            scalograms = tf.abs(out)  # magnitude, same layout as out
         elif self.outputformat == 'phase':
-            scalograms = tf.math.atan2(out_imag, out_real)  # phase [batch, n_channels, time, n_scales)]
+            scalograms = tf.math.angle(out)  # phase, same layout as out
+        elif single_channel:
+            scalograms = tf.stack([tf.math.real(out[:, 0]), tf.math.imag(out[:, 0])], axis=-1) # complex [batch, time, n_scales, 2]
         else:
-            scalograms = tf.concat([out_real, out_imag], axis=1) # complex [batch, 2*n_channels, time, n_scales)]
+            scalograms = tf.concat([tf.math.real(out), tf.math.imag(out)], axis=channel_axis) # complex, 2*n_channels in the channel axis of out
 
-        if self.data_format == 'channels_last' :
+        if single_channel:
+            if self.outputformat in ['magnitude', 'phase']:
+                scalograms = tf.expand_dims(tf.squeeze(scalograms, axis=1), axis=-1) #[batch, time, n_scales, 1]
+        elif depthwise:
+            scalograms = tf.transpose(a=scalograms, perm=[0, 1, 3, 2]) #[batch, time, channels, n_scales] -> [batch, time, n_scales, channels]
+        elif self.data_format == 'channels_last' :
             scalograms = tf.transpose(a=scalograms, perm=[0, 2, 3, 1]) #[batch, time, n_scales, channels]
 
         return scalograms
 
+    def get_concrete(self, time_len, n_channels, batch_size=None):
+        """
+        Traces the CWT for inputs of a fixed shape. Calling the returned
+        function reuses the same graph for every batch instead of retracing
+        when the input shape changes. With jit_compile, XLA still compiles
+        once per distinct batch size unless batch_size is given.
+
+        Args:
+            time_len: (int) Number of samples of the input signals.
+            n_channels: (int) Number of channels of the input signals.
+            batch_size: (int) Number of signals per batch, or None to accept
+                any batch size. Default None.
+        Returns:
+            Concrete function that maps a float32 batch of inputs, in the
+            layout given by data_format, to its scalograms.
+        """
+        if self.data_format == 'channels_last':
+            shape = [batch_size, time_len, n_channels]
+        else:
+            shape = [batch_size, n_channels, time_len]
+        return self._compute.get_concrete_function(tf.TensorSpec(shape, tf.float32))
+
 
 class ComplexMorletCWT(ContinuousWaveletTransform):
     """CWT with the complex Morlet wavelet filter bank."""
@@ -106,7 +459,10 @@ class ComplexMorletCWT(ContinuousWaveletTransform):
             stride=1,
             name='ComplexMorletCWT',
             output='complex',
-            data_format='channels_last'):
+            data_format='channels_last',
+            fft_mode=False,
+            fft_epsilon=1e-4,
+            jit_compile=False):
         """
         Computes the complex morlet wavelets
 
@@ -148,14 +504,28 @@ class ComplexMorletCWT(ContinuousWaveletTransform):
             n_scales: (int) Number of scales for the scalogram.
             size_factor: (float) Factor by which the size of the kernels will
                 be increased with respect to the original size. Default 1.0.
-            trainable: (boolean) If True, the wavelet width is trainable.
-                Default to False.
+            trainable: (boolean) If True, the wavelet width is trainable,
+                and the wavelets are rebuilt from it in every traced call,
+                both in the time domain and in fft_mode. Default to False.
             border_crop: (int) Non-negative integer that specifies the number
                 of samples to be removed at each border after computing the cwt.
                 This parameter allows to input a longer signal than the final
                 desired size to remove border effects of the CWT. Default 0.
             stride: (int) The stride of the sliding window across the input.
                 Default is 1.
+            fft_mode: (boolean) If True, the CWT is computed in the Fourier
+                domain using the analytic spectrum of the Morlet wavelet,
+                which is faster for low frequencies (long kernels). Requires
+                a static time_len. The spectrum is that of the untruncated
+                wavelet, including its negative frequencies and aliases, so
+                the result approximates the convolution up to the kernel
+                truncation (about 0.1% of the peak). Default False.
+            fft_epsilon: (float) In fft_mode, each wavelet spectrum is
+                truncated where its magnitude falls below fft_epsilon, so
+                the product with the signal spectrum is computed only on
+                its support. Default 1e-4.
+            jit_compile: (boolean) If True, the CWT is compiled with XLA.
+                Default False.
         """
 
         # Checking
@@ -175,53 +545,74 @@ class ComplexMorletCWT(ContinuousWaveletTransform):
         self.lower_freq = lower_freq
         self.upper_freq = upper_freq
         self.size_factor = size_factor
+        self.fft_epsilon = fft_epsilon
         self.trainable = trainable
-        # Generate initial and last scale
-        s_0 = 1 / self.upper_freq
-        s_n = 1 / self.lower_freq
         # Generate the array of scales
-        base = np.power(s_n / s_0, 1 / (n_scales - 1))
-        self.scales = s_0 * np.power(base, np.arange(n_scales))
-        # Generate the frequency range
-        self.frequencies = 1 / self.scales
+        self.scales = _morlet_scales(self.lower_freq, self.upper_freq, n_scales)
         # Trainable wavelet width value
         self.wavelet_width = tf.Variable(
             initial_value=self.initial_wavelet_width,
             trainable=self.trainable,
             name='wavelet_width',
             dtype=tf.float32)
-        super().__init__(n_scales, border_crop, stride, name, output, data_format)
+        super().__init__(n_scales, border_crop, stride, name, output, data_format, fft_mode, jit_compile)
+
+    @property
+    def frequencies(self):
+        """Frequency range of the scalogram, computed from the scales."""
+        return 1 / self.scales
 
     def _build_wavelet_bank(self):
         # Generate the wavelets
-        # We will make a bigger wavelet in case the width grows
-        # For the size of the wavelet we use the initial width value.
-        # |t| < truncation_size => |k| < truncation_size * fs
-        truncation_size = self.scales.max() * np.sqrt(4.5 * self.initial_wavelet_width) * self.fs
-        one_side = int(self.size_factor * truncation_size)
-        kernel_size = 2 * one_side + 1
-        k_array = np.arange(kernel_size, dtype=np.float32) - one_side
-        t_array = k_array / self.fs  # Time units
-        # Wavelet bank shape: 1, kernel_size, 1, n_scales
-        wavelet_bank_real = []
-        wavelet_bank_imag = []
-        for scale in self.scales:
-            norm_constant = tf.sqrt(np.pi * self.wavelet_width) * scale * self.fs / 2.0
-            scaled_t = t_array / scale
-            exp_term = tf.exp(-(scaled_t ** 2) / self.wavelet_width)
-            kernel_base = exp_term / norm_constant
-            kernel_real = kernel_base * np.cos(2 * np.pi * scaled_t)
-            kernel_imag = kernel_base * np.sin(2 * np.pi * scaled_t)
-            wavelet_bank_real.append(kernel_real)
-            wavelet_bank_imag.append(kernel_imag)
-        # Stack wavelets (shape = kernel_size, n_scales)
-        wavelet_bank_real = tf.stack(wavelet_bank_real, axis=-1)
-        wavelet_bank_imag = tf.stack(wavelet_bank_imag, axis=-1)
+        if not self.wavelet_width.trainable:
+            # Fixed width: compute the bank in NumPy and store it as constants
+            # so that TF can fold them into the convolution.
+            wavelet_bank_real, wavelet_bank_imag, _ = _cached_bank(*self._bank_key())
+            return wavelet_bank_real, wavelet_bank_imag
+        # Broadcast time (rows) against scales (columns) to build the whole
+        # bank at once, shape = kernel_size, n_scales
+        t_array = _morlet_time(self.scales, self.initial_wavelet_width, self.size_factor, self.fs)
+        scales = tf.constant(self.scales, dtype=tf.float32)[None, :]
+        t = tf.constant(t_array, dtype=tf.float32)[:, None]
+        scaled_t = t / scales
+        norm_constant = tf.sqrt(np.pi * self.wavelet_width) * scales * self.fs / 2.0
+        kernel_base = tf.exp(-(scaled_t ** 2) / self.wavelet_width) / norm_constant
+        # Share the phase between cos and sin
+        phase = 2 * np.pi * scaled_t
+        wavelet_bank_real = kernel_base * tf.cos(phase)
+        wavelet_bank_imag = kernel_base * tf.sin(phase)
         # Give it proper shape for convolutions
-        # -> shape: 1, kernel_size, n_scales
-        wavelet_bank_real = tf.expand_dims(wavelet_bank_real, axis=0)
-        wavelet_bank_imag = tf.expand_dims(wavelet_bank_imag, axis=0)
         # -> shape: 1, kernel_size, 1, n_scales
-        wavelet_bank_real = tf.expand_dims(wavelet_bank_real, axis=2)
-        wavelet_bank_imag = tf.expand_dims(wavelet_bank_imag, axis=2)
+        wavelet_bank_real = tf.reshape(wavelet_bank_real, [1, -1, 1, self.n_scales])
+        wavelet_bank_imag = tf.reshape(wavelet_bank_imag, [1, -1, 1, self.n_scales])
         return wavelet_bank_real, wavelet_bank_imag
+
+    def _build_filters(self):
+        if not self.wavelet_width.trainable:
+            # Shared with the other layers using the same fixed bank
+            return _cached_bank(*self._bank_key())[2]
+        # Rebuilt from the wavelet width, as _build_wavelet_spectra does
+        return _stack_filters(*self._build_wavelet_bank())
+
+    def _build_wavelet_spectra(self, fft_length):
+        if not self.wavelet_width.trainable:
+            return list(_cached_spectra(*self._bank_key(), float(self.fft_epsilon), fft_length))
+        support = _morlet_support(
+            self.scales, self.initial_wavelet_width, self.size_factor, self.fs,
+            self.fft_epsilon, fft_length)
+        # Angular frequency (rad/s) to DFT bin
+        bin_per_omega = fft_length / (2 * np.pi * self.fs)
+        spectra = []
+        for scale, (first_bin, last_bin) in zip(self.scales, support):
+            scaled_omega = np.arange(first_bin, last_bin) / bin_per_omega * scale
+            scaled_omega = tf.constant(scaled_omega, dtype=tf.float32)
+            values = 2.0 * tf.exp(-self.wavelet_width * (scaled_omega - 2 * np.pi) ** 2 / 4.0)
+            values = _fold_spectrum(values, fft_length)
+            spectra.append((first_bin, tf.cast(values, tf.complex64)))
+        return spectra
+
+    def _bank_key(self):
+        """Hashable hyperparameters of a fixed wavelet bank."""
+        return (float(self.fs), float(self.lower_freq), float(self.upper_freq),
+                int(self.n_scales), float(self.initial_wavelet_width),
+                float(self.size_factor))
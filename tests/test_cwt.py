@@ -0,0 +1,50 @@
+"""Checks of the CWT layer against the "SAME" convolution followed by the border crop."""
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from CWT.cwt import ComplexMorletCWT
+
+
+def same_then_crop(layer, inputs):
+    """Reference CWT: "SAME" convolution of each channel with the wavelet
+    bank, then border_crop // stride samples removed at each border.
+    Returns the complex output of shape [batch, n_out, n_scales, 2 * n_channels]."""
+    batch_size, time_len, n_channels = inputs.shape
+    # [batch, time_len, n_channels] -> [batch * n_channels, time_len, 1]
+    flat = tf.reshape(tf.transpose(inputs, [0, 2, 1]), [-1, time_len, 1])
+    out_real = tf.nn.conv1d(flat, layer.real_part[0], layer.stride, padding="SAME")
+    out_imag = -tf.nn.conv1d(flat, layer.imaginary_part[0], layer.stride, padding="SAME")
+    start = layer.border_crop // layer.stride
+    n_same = out_real.shape[1]
+    out = tf.concat([out_real, out_imag], axis=0)[:, start:max(n_same - start, start)]
+    # -> [2, batch, n_channels, n_out, n_scales] -> [batch, n_out, n_scales, 2 * n_channels]
+    out = tf.reshape(out, [2, batch_size, n_channels, -1, layer.n_scales])
+    out = tf.transpose(out, [1, 3, 4, 0, 2])
+    return tf.reshape(out, [batch_size, -1, layer.n_scales, 2 * n_channels])
+
+
+@pytest.mark.parametrize("n_channels", [1, 3])
+@pytest.mark.parametrize("stride", [1, 2, 3])
+@pytest.mark.parametrize("border_crop", [0, 7, 40, 99, 100, 150])
+def test_matches_same_then_crop(n_channels, stride, border_crop):
+    layer = ComplexMorletCWT(
+        wavelet_width=0.9, fs=100., lower_freq=2., upper_freq=30., n_scales=10,
+        border_crop=border_crop, stride=stride)
+    inputs = tf.constant(
+        np.random.default_rng(0).standard_normal((2, 200, n_channels)), dtype=tf.float32)
+    expected = same_then_crop(layer, inputs)
+    out = layer(inputs)
+    assert out.shape == expected.shape
+    np.testing.assert_allclose(out.numpy(), expected.numpy(), rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("n_channels", [1, 3])
+@pytest.mark.parametrize("fft_mode", [False, True])
+def test_crop_removing_every_sample_is_empty(n_channels, fft_mode):
+    layer = ComplexMorletCWT(
+        wavelet_width=0.9, fs=100., lower_freq=2., upper_freq=30., n_scales=10,
+        border_crop=100, fft_mode=fft_mode)
+    out = layer(tf.zeros((2, 200, n_channels)))
+    assert out.shape == (2, 0, 10, 2 * n_channels)